@@ -1,13 +1,148 @@
 # app.py
 import io
-import base64
+import os
+import re
+import wave
+import binascii
+import hashlib
+import sqlite3
+import threading
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+import diskcache
+import httpx
 import streamlit as st
-from gtts import gTTS
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential_jitter
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from gtts import gTTS, gTTSError
 from langdetect import detect, LangDetectException
-from deep_translator import GoogleTranslator
 import pycountry
 
+# Piper (piper-tts >= 1.3) is optional; without it every language uses gTTS.
+try:
+    from piper import PiperVoice, SynthesisConfig
+except ImportError:
+    PiperVoice = SynthesisConfig = None
+
+# CLD3 is optional too: gcld3 ships no Linux wheels for current Pythons and
+# needs protoc plus the libprotobuf headers to build. Without it language
+# detection uses langdetect alone.
+try:
+    import gcld3
+except ImportError:
+    gcld3 = None
+
+# Google's free endpoints start refusing requests above roughly 5 req/s.
+MAX_TRANSLATION_WORKERS = 8
+MAX_CONCURRENT_REQUESTS = 5
+GOOGLE_TRANSLATE_URL = "https://translate.googleapis.com/translate_a/single"
+# Google Translate rejects payloads longer than this many characters.
+MAX_TRANSLATE_CHARS = 5000
+# Targets written without spaces between sentences.
+UNSPACED_TARGETS = {"ja", "zh"}
+# On-disk cache shared by all sessions and kept across restarts. Bump the
+# version whenever the format of cached values changes.
+DISK_CACHE_DIR = os.environ.get("TRANSLATOR_CACHE_DIR", ".cache_xlate")
+DISK_CACHE_VERSION = 1
+# Failures of the cache itself; these fall back to uncached calls.
+DISK_CACHE_ERRORS = (OSError, sqlite3.Error, diskcache.Timeout)
+# Sentence breaks: whitespace after Latin/Devanagari terminators, or
+# directly after CJK ones (which are not followed by a space). Either may
+# carry one closing quote or bracket, and a run of CJK terminators or
+# closers is never split apart.
+SENTENCE_BREAK_RE = re.compile(
+    r"(?:(?<=[.!?\u0964])|(?<=[.!?\u0964][\"'\u201d\u2019)\]]))\s+"
+    r"|(?:(?<=[\u3002\uff01\uff1f])|(?<=[\u3002\uff01\uff1f][\u300d\u300f\u201d\u2019\uff09]))"
+    r"(?![\u3002\uff01\uff1f\u300d\u300f\u201d\u2019\uff09])\s*"
+)
+
+deep_languages = {
+    'ar':'Arabic','bn':'Bengali','cs':'Czech','da':'Danish','de':'German',
+    'en':'English','es':'Spanish','fr':'French','hi':'Hindi','it':'Italian',
+    'ja':'Japanese','ko':'Korean','ml':'Malayalam','mr':'Marathi','nl':'Dutch',
+    'pa':'Punjabi','pt':'Portuguese','ru':'Russian','ta':'Tamil','te':'Telugu',
+    'tr':'Turkish','uk':'Ukrainian','zh':'Chinese'
+}
+
+@st.cache_resource(show_spinner=False)
+def load_language_tables():
+    """Return `(name_to_code, sorted_names, english_index)`, built once per process."""
+    names = tuple(sorted(deep_languages.values()))
+    return {v: k for k, v in deep_languages.items()}, names, names.index("English")
+
+name_to_code, all_languages, english_idx = load_language_tables()
+
+# Languages spoken by a local Piper voice instead of the gTTS web service.
+# No voices ship with the app. To enable one, put the model and its
+# .onnx.json config in PIPER_VOICE_DIR, e.g. from inside that directory:
+#   python -m piper.download_voices en_US-lessac-medium
+# A missing model (or a missing piper package) falls back to gTTS.
+PIPER_VOICE_DIR = os.environ.get("PIPER_VOICE_DIR", "voices")
+PIPER_VOICES = {
+    "en": "en_US-lessac-medium.onnx",
+    "es": "es_ES-davefx-medium.onnx",
+    "fr": "fr_FR-siwis-medium.onnx",
+    "de": "de_DE-thorsten-medium.onnx",
+    "it": "it_IT-riccardo-x_low.onnx",
+}
+LOCAL_TTS_LANGS = set(PIPER_VOICES)
+
 # ---------- Helpers ----------
+def script_thread_pool():
+    """Thread pool whose workers share the current script run's context."""
+    return ThreadPoolExecutor(
+        max_workers=MAX_TRANSLATION_WORKERS,
+        initializer=add_script_run_ctx,
+        initargs=(None, get_script_run_ctx()),
+    )
+
+def is_retryable_status(status):
+    """True for rate limiting and server-side HTTP errors."""
+    return status == 429 or status >= 500
+
+def is_transient_error(exc):
+    """True for network failures, rate limiting and server-side errors."""
+    if isinstance(exc, httpx.HTTPStatusError):
+        return is_retryable_status(exc.response.status_code)
+    if isinstance(exc, gTTSError):
+        # gTTS leaves `rsp` unset when the request never got a response.
+        rsp = getattr(exc, "rsp", None)
+        return rsp is None or is_retryable_status(rsp.status_code)
+    return isinstance(exc, httpx.TransportError)
+
+retry_transient = retry(
+    stop=stop_after_attempt(4),
+    wait=wait_exponential_jitter(initial=0.5, max=8),
+    retry=retry_if_exception(is_transient_error),
+    reraise=True,
+)
+
+@st.cache_resource
+def get_disk_cache():
+    """Open the persistent translation/TTS cache once per process."""
+    return diskcache.Cache(DISK_CACHE_DIR, size_limit=2**30)
+
+def disk_cached(kind, parts, compute):
+    """Return the stored value for `(kind, *parts)`, computing and storing it on a miss.
+
+    The cache is only an optimization: if it cannot be opened, read or
+    written, the value is computed without it.
+    """
+    payload = "\0".join([kind, *map(str, parts)]).encode("utf-8")
+    key = bytes([DISK_CACHE_VERSION]) + hashlib.blake2b(payload, digest_size=16).digest()
+    try:
+        cache = get_disk_cache()
+        value = cache.get(key)
+    except DISK_CACHE_ERRORS:
+        return compute()
+    if value is None:
+        value = compute()
+        try:
+            cache[key] = value
+        except DISK_CACHE_ERRORS:
+            pass
+    return value
+
 def get_language_name(code):
     """Return a friendly language name for a language code."""
     try:
@@ -19,12 +154,21 @@ def get_language_name(code):
         pass
     return code
 
+def split_sentences(text):
+    """Split `text` into sentences on terminal punctuation."""
+    return [s for s in SENTENCE_BREAK_RE.split(text.strip()) if s]
+
+@st.cache_data(show_spinner=False)
+def load_bg_b64(image_file):
+    """Read an image file and return it base64-encoded."""
+    with open(image_file, "rb") as f:
+        data = f.read()
+    return binascii.b2a_base64(data, newline=False).decode("ascii")
+
 def add_bg_from_local(image_file):
     """Set a background image for the app."""
     try:
-        with open(image_file, "rb") as f:
-            data = f.read()
-        b64 = base64.b64encode(data).decode()
+        b64 = load_bg_b64(image_file)
         st.markdown(
             f"""
             <style>
@@ -40,13 +184,181 @@ def add_bg_from_local(image_file):
     except FileNotFoundError:
         pass
 
-def read_aloud_streamlit(text, lang="en"):
+@st.cache_resource
+def get_request_slots():
+    """Process-wide semaphore limiting concurrent calls to Google."""
+    return threading.Semaphore(MAX_CONCURRENT_REQUESTS)
+
+@st.cache_resource
+def get_http_client():
+    """Shared HTTP/2 client; concurrent translations multiplex one connection."""
+    return httpx.Client(
+        http2=True,
+        timeout=10.0,
+        limits=httpx.Limits(max_keepalive_connections=MAX_TRANSLATION_WORKERS),
+    )
+
+def translate_via_httpx(text, target):
+    """Translate `text` into `target` with one call to Google's web endpoint."""
+    response = get_http_client().post(
+        GOOGLE_TRANSLATE_URL,
+        params={"client": "gtx", "sl": "auto", "tl": target, "dt": "t"},
+        data={"q": text},
+    )
+    response.raise_for_status()
+    segments = response.json()[0] or []
+    return "".join(segment[0] for segment in segments if segment[0])
+
+@retry_transient
+def translate_chunk(text, target):
+    """Send a single translation request for `text`."""
+    with get_request_slots():
+        return translate_via_httpx(text, target)
+
+def split_oversized(sentence):
+    """Cut `sentence` into pieces of at most MAX_TRANSLATE_CHARS characters.
+
+    Cuts fall on the last space before the limit where there is one, and
+    exactly at the limit otherwise (e.g. for unspaced CJK text).
+    """
+    pieces = []
+    while len(sentence) > MAX_TRANSLATE_CHARS:
+        cut = sentence.rfind(" ", 0, MAX_TRANSLATE_CHARS + 1)
+        if cut <= 0:
+            cut = MAX_TRANSLATE_CHARS
+        pieces.append(sentence[:cut].rstrip())
+        sentence = sentence[cut:].lstrip()
+    if sentence:
+        pieces.append(sentence)
+    return pieces
+
+def translate_bulk(text, target):
+    """Translate `text` using as few requests as the payload limit allows.
+
+    Text that fits in one request is sent as-is. Longer text is split on
+    sentence boundaries (and overlong sentences at the limit) and packed
+    into chunks of up to MAX_TRANSLATE_CHARS characters, one request per
+    chunk.
+    """
+    if len(text) <= MAX_TRANSLATE_CHARS:
+        return translate_chunk(text, target)
+
+    chunks, current = [], ""
+    sentences = [piece for s in split_sentences(text) for piece in split_oversized(s)]
+    for sentence in sentences:
+        candidate = f"{current} {sentence}" if current else sentence
+        if len(candidate) <= MAX_TRANSLATE_CHARS:
+            current = candidate
+            continue
+        if current:
+            chunks.append(current)
+        current = sentence
+    if current:
+        chunks.append(current)
+    separator = "" if target.split("-")[0] in UNSPACED_TARGETS else " "
+    return separator.join(translate_chunk(chunk, target) for chunk in chunks)
+
+@st.cache_data(show_spinner=False, max_entries=2048)
+def cached_translate(text, target):
+    """Translate `text` into `target`, reusing results across reruns and restarts."""
+    return disk_cached("translate", (text, target), lambda: translate_bulk(text, target))
+
+@st.cache_resource
+def get_language_identifier():
+    """Return the shared CLD3 identifier and the lock guarding it."""
+    return gcld3.NNetLanguageIdentifier(min_num_bytes=0, max_num_bytes=1000), threading.Lock()
+
+@st.cache_data(show_spinner=False, max_entries=2048)
+def cached_detect(text):
+    """Detect the language code of `text`, reusing results across reruns.
+
+    CLD3 answers first when installed; langdetect is consulted when CLD3 is
+    missing or not confident, and may raise LangDetectException.
+    """
+    if gcld3 is None:
+        return detect(text)
+    identifier, lock = get_language_identifier()
+    with lock:
+        result = identifier.FindLanguage(text=text)
+    if result.is_reliable and result.language != "und":
+        return result.language
+    return detect(text)
+
+def detect_source(text):
+    """Return the detected language code of `text`, or None if unknown."""
     try:
-        tts = gTTS(text=text, lang=lang, slow=False)
-        mp3_fp = io.BytesIO()
+        return cached_detect(text)
+    except LangDetectException:
+        return None
+
+@st.cache_resource
+def load_piper_voice(lang):
+    """Load the Piper voice for `lang` once per process, or None if unavailable."""
+    path = os.path.join(PIPER_VOICE_DIR, PIPER_VOICES[lang])
+    if PiperVoice is None or not os.path.exists(path):
+        return None
+    return PiperVoice.load(path)
+
+def synthesize_local(voice, text, slow=False):
+    """Render `text` with a Piper voice and return WAV bytes."""
+    config = SynthesisConfig(length_scale=1.5 if slow else 1.0)
+    wav_fp = io.BytesIO()
+    with wave.open(wav_fp, "wb") as wav_file:
+        voice.synthesize_wav(text, wav_file, syn_config=config)
+    return wav_fp.getvalue()
+
+@retry_transient
+def synthesize_gtts(text, lang, slow=False):
+    """Return the gTTS MP3 for `text` as bytes."""
+    tts = gTTS(text=text, lang=lang, slow=slow)
+    mp3_fp = io.BytesIO()
+    with get_request_slots():
         tts.write_to_fp(mp3_fp)
-        mp3_fp.seek(0)
-        st.audio(mp3_fp, format="audio/mp3")
+    return mp3_fp.getvalue()
+
+def is_speakable(text):
+    """True if `text` contains at least one letter or digit."""
+    return any(unicodedata.category(c)[0] in "LN" for c in text)
+
+def synthesize_gtts_sentences(text, lang, slow=False):
+    """Return the gTTS MP3 for `text`, synthesizing its sentences concurrently.
+
+    Each sentence is a separate request, so a long paragraph costs about
+    one round trip instead of one per sentence. MP3 frames are
+    self-contained, so the per-sentence clips concatenate into one file.
+    """
+    # gTTS rejects text with nothing to pronounce, so stray punctuation
+    # pieces (e.g. the dots of "Wait . . . what") ride along with a neighbour.
+    sentences = []
+    for piece in split_sentences(text) or [text]:
+        if sentences and not (is_speakable(piece) and is_speakable(sentences[-1])):
+            sentences[-1] = f"{sentences[-1]} {piece}"
+        else:
+            sentences.append(piece)
+    if len(sentences) == 1:
+        return synthesize_gtts(text, lang, slow=slow)
+    with script_thread_pool() as pool:
+        return b"".join(pool.map(lambda s: synthesize_gtts(s, lang, slow=slow), sentences))
+
+@st.cache_data(show_spinner=False, max_entries=512)
+def cached_tts_bytes(text, lang="en", slow=False):
+    """Return `(audio_bytes, mime_type)` for `text`, reusing results across reruns.
+
+    Languages in LOCAL_TTS_LANGS are synthesized offline as WAV when their
+    voice is installed; everything else is an MP3 from gTTS, which is also
+    kept in the on-disk cache.
+    """
+    voice = load_piper_voice(lang) if lang in LOCAL_TTS_LANGS else None
+    if voice is not None:
+        return synthesize_local(voice, text, slow=slow), "audio/wav"
+
+    audio = disk_cached("tts", (text, lang, slow), lambda: synthesize_gtts_sentences(text, lang, slow=slow))
+    return audio, "audio/mp3"
+
+def read_aloud_streamlit(text, lang="en"):
+    try:
+        audio, fmt = cached_tts_bytes(text, lang)
+        st.audio(audio, format=fmt)
     except Exception as e:
         st.warning(f"Audio generation failed for lang='{lang}': {e}")
 
@@ -62,14 +374,28 @@ def normalize_gtts_code(code):
         return "id"
     return gtts_code
 
+@st.cache_data(show_spinner=False, max_entries=2048)
+def cached_letter_mp3(letter, lang):
+    """Return the slow gTTS MP3 for one spelled letter, reusing it across words."""
+    return disk_cached("letter", (letter, lang), lambda: synthesize_gtts(letter + ",", lang, slow=True))
+
 def spell_text_audio_bytes(word, lang="en"):
-    dotted = ", ".join(list(word))
     gtts_lang = normalize_gtts_code(lang)
-    tts = gTTS(text=dotted, lang=gtts_lang, slow=True)
-    mp3_fp = io.BytesIO()
-    tts.write_to_fp(mp3_fp)
-    mp3_fp.seek(0)
-    return mp3_fp
+    if gtts_lang in LOCAL_TTS_LANGS and load_piper_voice(gtts_lang) is not None:
+        dotted = ", ".join(list(word))
+        audio, fmt = cached_tts_bytes(dotted, gtts_lang, slow=True)
+        return io.BytesIO(audio), fmt
+
+    # gTTS letters are fetched once per unique letter and cached; MP3 frames
+    # are self-contained, so the per-letter clips concatenate cleanly.
+    # Keep letters, combining marks (vowel signs, viramas) and digits; only
+    # whitespace and punctuation are silent.
+    letters = [c for c in word if unicodedata.category(c)[0] in "LMN"]
+    if not letters:
+        raise ValueError("the word has no characters to spell")
+    with script_thread_pool() as pool:
+        list(pool.map(lambda c: cached_letter_mp3(c, gtts_lang), set(letters)))
+    return io.BytesIO(b"".join(cached_letter_mp3(c, gtts_lang) for c in letters)), "audio/mp3"
 
 # ---------- Page layout ----------
 st.set_page_config(
@@ -89,7 +415,7 @@ with col1:
     if st.button("Detect language"):
         if paragraph.strip():
             try:
-                code = detect(paragraph)
+                code = cached_detect(paragraph)
                 st.success(f"Detected: {get_language_name(code)} ({code})")
             except LangDetectException:
                 st.error("Language detection failed (text too short or ambiguous).")
@@ -101,7 +427,10 @@ with col1:
     if st.button("Translate to English (if not already)"):
         if paragraph.strip():
             try:
-                translated = GoogleTranslator(source='auto', target='en').translate(paragraph)
+                if detect_source(paragraph) == 'en':
+                    translated = paragraph
+                else:
+                    translated = cached_translate(paragraph, 'en')
                 st.subheader("Translated to English:")
                 st.write(translated)
             except Exception as e:
@@ -112,52 +441,59 @@ with col1:
 with col2:
     st.subheader("Translate & read aloud")
 
-    deep_languages = {
-        'ar':'Arabic','bn':'Bengali','cs':'Czech','da':'Danish','de':'German',
-        'en':'English','es':'Spanish','fr':'French','hi':'Hindi','it':'Italian',
-        'ja':'Japanese','ko':'Korean','ml':'Malayalam','mr':'Marathi','nl':'Dutch',
-        'pa':'Punjabi','pt':'Portuguese','ru':'Russian','ta':'Tamil','te':'Telugu',
-        'tr':'Turkish','uk':'Ukrainian','zh':'Chinese'
-    }
-
-    all_languages = list(deep_languages.values())
+    # The checkbox stays outside the form: toggling it has to rerun the
+    # script so the multiselect picks up its new default.
     select_all = st.checkbox("Select all languages", value=False)
     default_selection = all_languages if select_all else ["English"]
 
-    target_languages = st.multiselect(
-        "Select target languages (audio will attempt to play where supported):",
-        all_languages,
-        default=default_selection
-    )
+    with st.form("translate_form", clear_on_submit=False, border=False):
+        target_languages = st.multiselect(
+            "Select target languages (audio will attempt to play where supported):",
+            all_languages,
+            default=default_selection
+        )
+        translate_submitted = st.form_submit_button("Translate & Read Aloud")
 
-    if st.button("Translate & Read Aloud"):
+    if translate_submitted:
         if not paragraph.strip():
             st.info("Type or paste a paragraph first.")
         else:
-            for name in target_languages:
-                code = [k for k,v in deep_languages.items() if v==name][0]
-                try:
-                    translated_text = GoogleTranslator(source='auto', target=code).translate(paragraph)
-                    st.markdown(f"**{name}** ({code})")
-                    st.write(translated_text)
-                    read_aloud_streamlit(translated_text, lang=normalize_gtts_code(code))
-                except Exception as e:
-                    st.error(f"Translation to {name} failed: {e}")
+            # Only the HTTP calls run in workers; Streamlit elements are
+            # rendered here on the script thread, in selection order.
+            # Targets matching the source language need no request at all.
+            source = detect_source(paragraph)
+            with script_thread_pool() as pool:
+                jobs = []
+                for name in target_languages:
+                    code = name_to_code[name]
+                    future = None if code == source else pool.submit(cached_translate, paragraph, code)
+                    jobs.append((name, code, future))
+
+                for name, code, future in jobs:
+                    try:
+                        translated_text = paragraph if future is None else future.result()
+                        st.markdown(f"**{name}** ({code})")
+                        st.write(translated_text)
+                        read_aloud_streamlit(translated_text, lang=normalize_gtts_code(code))
+                    except Exception as e:
+                        st.error(f"Translation to {name} failed: {e}")
 
     st.markdown("---")
     st.subheader("Spell a word aloud")
-    word_to_spell = st.text_input("Word to spell (single word recommended):", "")
-    spell_lang = st.selectbox("Spelling voice language:", all_languages, index=all_languages.index("English"))
+    with st.form("spell_form", clear_on_submit=False, border=False):
+        word_to_spell = st.text_input("Word to spell (single word recommended):", "")
+        spell_lang = st.selectbox("Spelling voice language:", all_languages, index=english_idx)
+        spell_submitted = st.form_submit_button("Spell Word Aloud")
 
-    if st.button("Spell Word Aloud"):
+    if spell_submitted:
         w = word_to_spell.strip()
         if not w:
             st.info("Type a word to spell aloud.")
         else:
-            code = [k for k,v in deep_languages.items() if v==spell_lang][0]
+            code = name_to_code[spell_lang]
             try:
-                audio_fp = spell_text_audio_bytes(w, lang=normalize_gtts_code(code))
+                audio_fp, fmt = spell_text_audio_bytes(w, lang=normalize_gtts_code(code))
                 st.markdown(f"**Spelling**: `{w}` (voice: {spell_lang} / {code})")
-                st.audio(audio_fp, format="audio/mp3")
+                st.audio(audio_fp, format=fmt)
             except Exception as e:
                 st.error(f"Could not generate spelling audio: {e}")